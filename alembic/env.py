@@ -6,13 +6,13 @@ from sqlalchemy import engine_from_config, pool
 # add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from app.config import settings
+from app.config import get_settings
 from app.models import Base
 
 # this is the Alembic Config object
 config = context.config
 # override URL with our application settings
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+config.set_main_option("sqlalchemy.url", get_settings().DATABASE_URL)
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,16 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_rollup_dirty'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('rollup_dirty',
+        sa.Column('date', sa.Date, primary_key=True),
+        sa.Column('marked_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now())
+    )
+
+def downgrade():
+    op.drop_table('rollup_dirty')
@@ -0,0 +1,4 @@
+import time
+
+# first import of the package; startup is measured from here (see main.lifespan)
+IMPORTED_AT = time.perf_counter()
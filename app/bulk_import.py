@@ -0,0 +1,284 @@
+"""
+Offline import of Strava bulk-export archives.
+
+Usage:
+    python -m app.bulk_import export_1234.zip export_5678/ [--athlete-id 1234]
+
+Each archive (zip or unpacked directory) is streamed row by row, classified,
+and loaded with a single COPY into a temp staging table that is then merged
+into `activities`. Activities already ingested from the API are kept as-is.
+No Strava API calls are made.
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import IO, Iterator
+from xml.etree.ElementTree import iterparse
+
+from .db import get_engine, session_scope
+from .flagging import flag_activities
+from .models import Participant
+from .classify import is_cycling, is_indoor, is_ebike
+from .rollup import mark_dirty, recompute_dirty
+from .utils_time import challenge_day, get_tz
+
+STAGING_DDL = """
+    CREATE TEMP TABLE activities_import (
+      seq                BIGINT,
+      athlete_id         INTEGER,
+      strava_activity_id BIGINT,
+      start_date_local   TIMESTAMPTZ,
+      distance_m         DOUBLE PRECISION,
+      moving_time_s      INTEGER,
+      sport_type         VARCHAR(64),
+      trainer            BOOLEAN,
+      is_virtual         BOOLEAN,
+      is_ebike           BOOLEAN
+    ) ON COMMIT DROP
+"""
+
+COPY_SQL = """
+    COPY activities_import (
+      seq, athlete_id, strava_activity_id, start_date_local, distance_m,
+      moving_time_s, sport_type, trainer, is_virtual, is_ebike
+    ) FROM STDIN
+"""
+
+# last staged row wins for activities listed twice. Rows already stored from the
+# API are left alone: webhook/backfill data is richer than the export.
+MERGE_SQL = """
+    INSERT INTO activities (
+      source, athlete_id, strava_activity_id, start_date_local, distance_m,
+      moving_time_s, sport_type, trainer, is_virtual, is_ebike, flagged
+    )
+    SELECT DISTINCT ON (strava_activity_id)
+           'strava', athlete_id, strava_activity_id, start_date_local, distance_m,
+           moving_time_s, sport_type, trainer, is_virtual, is_ebike, FALSE
+    FROM activities_import
+    ORDER BY strava_activity_id, seq DESC
+    ON CONFLICT ON CONSTRAINT uq_source_activity DO NOTHING
+    RETURNING id, start_date_local
+"""
+
+class Archive:
+    """Read-only view over an unpacked export directory or its .zip file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        self._prefix = ""
+        if self._zip:
+            # exports are sometimes re-zipped with a top-level folder
+            for name in self._zip.namelist():
+                if name.endswith("activities.csv"):
+                    self._prefix = name[: -len("activities.csv")]
+                    break
+
+    def exists(self, name: str) -> bool:
+        if self._zip:
+            try:
+                self._zip.getinfo(self._prefix + name)
+                return True
+            except KeyError:
+                return False
+        return os.path.exists(os.path.join(self.path, name))
+
+    @contextmanager
+    def open_text(self, name: str) -> Iterator[IO[str]]:
+        with self.open_binary(name) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+    @contextmanager
+    def open_binary(self, name: str) -> Iterator[IO[bytes]]:
+        if self._zip:
+            f = self._zip.open(self._prefix + name)
+        else:
+            f = open(os.path.join(self.path, name), "rb")
+        try:
+            yield f
+        finally:
+            f.close()
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+
+def normalize_sport(activity_type: str) -> str:
+    # export uses display names ("Virtual Ride", "E-Bike Ride"); the API uses "VirtualRide", "EBikeRide"
+    return (activity_type or "").replace(" ", "").replace("-", "")
+
+def parse_activity_date(raw: str) -> datetime:
+    """
+    Export dates are true UTC, e.g. "Mar 5, 2021, 6:30:12 AM". Ingest stores
+    Strava's `start_date_local` (challenge wall-clock time tagged as UTC), so
+    convert to that convention to land on the same challenge day.
+    """
+    try:
+        dt = datetime.strptime(raw.strip(), "%b %d, %Y, %I:%M:%S %p")
+    except ValueError:
+        dt = datetime.fromisoformat(raw.strip().replace("Z", "+00:00"))
+    dt = dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(get_tz()).replace(tzinfo=timezone.utc)
+
+def _num(raw: str | None) -> float:
+    if not raw:
+        return 0.0
+    return float(raw.replace(",", ""))
+
+def gpx_has_track(archive: Archive, filename: str) -> bool | None:
+    """
+    True if the GPX file contains at least one positioned trackpoint, None when
+    the file is not GPX (FIT files carry no cheap-to-read position marker).
+    Stops at the first trackpoint so large files are not fully decompressed.
+    """
+    if not filename or ".gpx" not in filename or not archive.exists(filename):
+        return None
+    with archive.open_binary(filename) as raw:
+        f = gzip.GzipFile(fileobj=raw) if filename.endswith(".gz") else raw
+        try:
+            for _, el in iterparse(f, events=("start",)):
+                if el.tag.endswith("trkpt") and el.get("lat") is not None:
+                    return True
+        except Exception:
+            return None
+    return False
+
+def read_profile_athlete(archive: Archive) -> tuple[int | None, str | None]:
+    if not archive.exists("profile.csv"):
+        return None, None
+    with archive.open_text("profile.csv") as f:
+        row = next(csv.DictReader(f), None) or {}
+    athlete_id = row.get("Athlete ID")
+    full = f"{(row.get('First Name') or '').strip()} {(row.get('Last Name') or '').strip()}".strip()
+    return (int(athlete_id) if athlete_id else None), (full or None)
+
+def iter_activity_rows(archive: Archive, athlete_id: int) -> Iterator[tuple]:
+    """
+    Stream `activities.csv` as COPY-ready tuples. Non-cycling rows are dropped.
+    """
+    with archive.open_text("activities.csv") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = {name: i for i, name in enumerate(header)}  # later duplicates win
+        n_distance = header.count("Distance")
+        # newer exports list "Distance" twice: km (display) first, metres later
+        distance_scale = 1.0 if n_distance > 1 else 1000.0
+        moving_col = "Moving Time" if "Moving Time" in idx else "Elapsed Time"
+
+        for row in reader:
+            if not row:
+                continue
+            sport = normalize_sport(row[idx["Activity Type"]])
+            if not is_cycling(sport) and not is_ebike(sport):
+                continue
+
+            trainer = False
+            if "Trainer" in idx:
+                trainer = row[idx["Trainer"]].strip().lower() in ("true", "1")
+            elif not is_indoor(sport, False) and "Filename" in idx:
+                # a GPX ride without any positioned trackpoint was recorded indoors
+                trainer = gpx_has_track(archive, row[idx["Filename"]]) is False
+
+            yield (
+                athlete_id,
+                int(row[idx["Activity ID"]]),
+                parse_activity_date(row[idx["Activity Date"]]),
+                _num(row[idx["Distance"]]) * distance_scale,
+                int(_num(row[idx[moving_col]])),
+                sport,
+                trainer,
+                sport == "VirtualRide",
+                is_ebike(sport),
+            )
+
+def resolve_participant(strava_athlete_id: int, name: str | None) -> int:
+    """
+    Map a Strava athlete id to a participant id, creating the participant if
+    they have not connected via OAuth yet (tokens are filled in on connect).
+    """
+    with session_scope() as db:
+        p = db.query(Participant).filter_by(strava_athlete_id=strava_athlete_id).first()
+        if not p:
+            p = Participant(strava_athlete_id=strava_athlete_id, name=name or f"Strava #{strava_athlete_id}")
+            db.add(p)
+            db.commit()
+        return p.id
+
+def import_archives(paths: list[str], athlete_id: int | None = None, recompute: bool = True) -> dict:
+    """
+    Load every archive in one COPY + merge transaction.
+    `athlete_id` (Strava id) is only needed when an archive lacks profile.csv.
+    Days of inserted rides are marked dirty; with `recompute` the already
+    rolled-up ones (and later days, for cumulative points) are recomputed.
+    """
+    archives = [Archive(p) for p in paths]
+    try:
+        owners = []
+        for arch in archives:
+            strava_id, name = read_profile_athlete(arch)
+            strava_id = strava_id or athlete_id
+            if strava_id is None:
+                raise ValueError(f"{arch.path}: no profile.csv, pass --athlete-id")
+            owners.append(resolve_participant(strava_id, name))
+
+        staged = 0
+        conn = get_engine().raw_connection()
+        try:
+            with conn.driver_connection.cursor() as cur:
+                cur.execute(STAGING_DDL)
+                with cur.copy(COPY_SQL) as copy:
+                    for arch, pid in zip(archives, owners):
+                        for row in iter_activity_rows(arch, pid):
+                            staged += 1
+                            copy.write_row((staged, *row))
+                cur.execute(MERGE_SQL)
+                inserted = cur.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    finally:
+        for arch in archives:
+            arch.close()
+
+    days = sorted({challenge_day(start) for _, start in inserted})
+    with session_scope() as db:
+        flagged = flag_activities(db, [pid for pid, _ in inserted])
+        mark_dirty(db, days)
+        recomputed = recompute_dirty(db) if recompute else []
+
+    return {
+        "archives": len(paths),
+        "staged": staged,
+        "inserted": len(inserted),
+        "flagged": flagged.changed,
+        "first_day": days[0] if days else None,
+        "recomputed": recomputed,
+    }
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Import Strava bulk-export archives into activities.")
+    parser.add_argument("archives", nargs="+", help="export .zip files or unpacked export directories")
+    parser.add_argument("--athlete-id", type=int, default=None,
+                        help="Strava athlete id, for archives without profile.csv")
+    parser.add_argument("--no-recompute", action="store_true",
+                        help="only mark affected days dirty (POST /admin/recompute/dirty later)")
+    args = parser.parse_args(argv)
+    result = import_archives(args.archives, args.athlete_id, recompute=not args.no_recompute)
+    print(f"staged {result['staged']} rides from {result['archives']} archive(s), inserted {result['inserted']}, flagged {result['flagged']}")
+    if result["first_day"]:
+        if result["recomputed"]:
+            rc = result["recomputed"]
+            print(f"recomputed {len(rc)} rolled-up day(s) from {rc[0]} to {rc[-1]}")
+        else:
+            print(f"earliest inserted ride is on {result['first_day']}; affected days are marked dirty")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
     DATABASE_URL: str
+    # optional streaming replica for read-only endpoints; falls back to DATABASE_URL
+    DATABASE_REPLICA_URL: str | None = None
     SECRET_KEY: str
     ENV: str = "dev"
 
@@ -17,4 +21,25 @@ class Settings(BaseSettings):
 
     ADMIN_TOKEN: str = "beat-admin"
 
-settings = Settings()
+    # persistent connections kept per engine (SQLAlchemy's QueuePool default)
+    DB_POOL_SIZE: int = 5
+    # connections opened during startup so the first requests skip the connect
+    # handshake; capped at DB_POOL_SIZE since overflow connections aren't kept
+    DB_POOL_PREWARM: int = 0
+
+    # in-process id -> name cache behind /participants
+    PARTICIPANT_DIRECTORY_TTL_S: int = 300
+
+    # anomaly flagging (see app/flagging.py)
+    FLAG_MAX_AVG_SPEED_KMH: float = 60.0
+    FLAG_MAX_DISTANCE_KM: float = 500.0
+    FLAG_BASELINE_FACTOR: float = 1.6
+    FLAG_BASELINE_MIN_RIDES: int = 10
+    FLAG_BASELINE_TTL_S: int = 3600
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Built on first use rather than at import, so importing the app needs no env.
+    """
+    return Settings()
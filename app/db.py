@@ -1,20 +1,55 @@
 from contextlib import contextmanager
+from functools import lru_cache
 from typing import Iterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from .config import settings
+from .config import get_settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+@lru_cache
+def get_engine() -> Engine:
+    """
+    Created on first use; `create_engine` itself does not connect.
+    """
+    s = get_settings()
+    return create_engine(s.DATABASE_URL, pool_size=s.DB_POOL_SIZE, pool_pre_ping=True, future=True)
+
+@lru_cache
+def get_read_engine() -> Engine:
+    """
+    Engine for read-only endpoints: the replica when DATABASE_REPLICA_URL is
+    set, otherwise the primary engine itself.
+    """
+    url = get_settings().DATABASE_REPLICA_URL
+    if not url:
+        return get_engine()
+    return create_engine(
+        url, pool_size=get_settings().DB_POOL_SIZE, pool_pre_ping=True, future=True,
+        execution_options={"postgresql_readonly": True},
+    )
+
+SessionLocal = sessionmaker(autoflush=False, autocommit=False, future=True)
+
+def prewarm_pool(n: int):
+    """
+    Open `n` pooled connections and hand them back, so the first requests
+    after boot don't each pay the connect round trips. Capped at the pool
+    size: overflow connections are discarded on return, and asking for more
+    than size + overflow would block until the pool timeout.
+    """
+    engine = get_engine()
+    n = min(n, engine.pool.size())
+    conns = [engine.connect() for _ in range(n)]
+    for c in conns:
+        c.close()
 
 def get_session() -> Iterator[Session]:
     """
     FastAPI dependency: yields a DB session and closes it afterwards.
     NOTE: Do NOT decorate this with @contextmanager. FastAPI expects a generator.
     """
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
@@ -25,7 +60,28 @@ def session_scope() -> Iterator[Session]:
     """
     Utility context manager for internal use (non-Dependency).
     """
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_session() -> Iterator[Session]:
+    """
+    FastAPI dependency like get_session, bound to the read engine. Never write through it.
+    """
+    db = SessionLocal(bind=get_read_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def read_session_scope() -> Iterator[Session]:
+    """
+    session_scope counterpart on the read engine.
+    """
+    db = SessionLocal(bind=get_read_engine())
     try:
         yield db
     finally:
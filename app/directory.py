@@ -0,0 +1,68 @@
+"""
+In-process participant directory (id -> display name).
+
+Loaded from the read engine with only the columns it needs, so token columns
+are never hydrated. Entries expire after PARTICIPANT_DIRECTORY_TTL_S.
+
+Writers call `put()` with the committed name. Put names are pinned over
+reloads for one TTL, so a lagging replica (or a load that started before
+the write) cannot bring an old name back. This is per process; other
+workers catch up within the TTL.
+"""
+import threading
+import time
+
+from sqlalchemy import select
+
+from .config import get_settings
+from .db import read_session_scope
+from .models import Participant
+
+def display_name(name: str | None, strava_athlete_id: int | None) -> str:
+    return name or f"Strava #{strava_athlete_id if strava_athlete_id is not None else '???'}"
+
+class ParticipantDirectory:
+    def __init__(self):
+        self._names: dict[int, str] = {}  # replaced, never mutated, so readers need no lock
+        self._pinned: dict[int, tuple[str, float]] = {}  # id -> (name, put at)
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()       # guards the fields above
+        self._load_lock = threading.Lock()  # one load at a time
+
+    def _stale(self) -> bool:
+        ttl = get_settings().PARTICIPANT_DIRECTORY_TTL_S
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > ttl
+
+    def _load(self):
+        with read_session_scope() as db:
+            rows = db.execute(
+                select(Participant.id, Participant.name, Participant.strava_athlete_id).order_by(Participant.id)
+            ).all()
+        loaded = {r.id: display_name(r.name, r.strava_athlete_id) for r in rows}
+
+        with self._lock:
+            now = time.monotonic()
+            ttl = get_settings().PARTICIPANT_DIRECTORY_TTL_S
+            self._pinned = {pid: v for pid, v in self._pinned.items() if now - v[1] <= ttl}
+            loaded.update({pid: name for pid, (name, _) in self._pinned.items()})
+            self._names = loaded
+            self._loaded_at = now
+
+    def names(self) -> dict[int, str]:
+        if self._stale():
+            with self._load_lock:
+                if self._stale():  # another thread may have reloaded while we waited
+                    self._load()
+        return self._names
+
+    def put(self, participant_id: int, name: str):
+        """
+        Record a committed name change (or a new participant) immediately.
+        """
+        with self._lock:
+            self._pinned[participant_id] = (name, time.monotonic())
+            names = dict(self._names)
+            names[participant_id] = name
+            self._names = dict(sorted(names.items()))
+
+directory = ParticipantDirectory()
@@ -0,0 +1,178 @@
+from datetime import date, timedelta
+from typing import Iterator
+import zlib
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from .db import get_read_engine
+from .security import require_admin
+from .utils_time import day_window
+
+router = APIRouter(prefix="/admin/export", dependencies=[Depends(require_admin)])
+
+CHUNK_ROWS = 10_000
+
+# table -> (columns, date filter); activities are filtered on the challenge-day window
+TABLES = {
+    "daily_rollups": (
+        "id, athlete_id, date, km_total, km_outdoor, km_indoor, met_25km, "
+        "first_start_time_local, early_bird, night_owl",
+        "date BETWEEN %(start)s AND %(end)s",
+    ),
+    "points": (
+        "id, date, athlete_id, daily_points, cumulative_points",
+        "date BETWEEN %(start)s AND %(end)s",
+    ),
+    "awards": (
+        "id, date, category, athlete_id, value_num",
+        "date BETWEEN %(start)s AND %(end)s",
+    ),
+    "activities": (
+        "id, source, athlete_id, strava_activity_id, start_date_local, distance_m, "
+        "moving_time_s, sport_type, trainer, is_virtual, is_ebike, flagged",
+        "start_date_local >= %(start)s AND start_date_local < %(end)s",
+    ),
+}
+
+def _select_sql(table: str) -> str:
+    cols, where = TABLES[table]
+    return f"SELECT {cols} FROM {table} WHERE {where} ORDER BY id"
+
+def _bounds(table: str, start: date, end: date) -> dict:
+    if table == "activities":
+        return {"start": day_window(start)[0], "end": day_window(end + timedelta(days=1))[0]}
+    return {"start": start, "end": end}
+
+def stream_csv(table: str, params: dict, compress: bool = True) -> Iterator[bytes]:
+    """
+    COPY ... TO STDOUT, optionally gzip-compressed on the fly. Postgres hands
+    back bounded blocks, so memory stays flat however large the range is.
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None  # gzip container
+    conn = get_read_engine().raw_connection()
+    try:
+        with conn.driver_connection.cursor() as cur:
+            sql = f"COPY ({_select_sql(table)}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            with cur.copy(sql, params) as copy:
+                for block in copy:
+                    out = gz.compress(bytes(block)) if gz else bytes(block)
+                    if out:
+                        yield out
+        if gz:
+            yield gz.flush()
+    finally:
+        conn.close()
+
+class _ChunkSink:
+    """
+    Write-only file object for ParquetWriter. `drain()` hands over the bytes
+    written so far; `tell()` keeps counting so footer offsets stay correct.
+    """
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+def _arrow_schema(pa, description):
+    # built from the column type oids so all-NULL first chunks don't pin a null type
+    types = {
+        16: pa.bool_(), 20: pa.int64(), 23: pa.int32(), 701: pa.float64(),
+        1082: pa.date32(), 1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(c.name, types.get(c.type_code, pa.string())) for c in description])
+
+def stream_parquet(table: str, params: dict) -> Iterator[bytes]:
+    """
+    Server-side cursor fetched CHUNK_ROWS at a time, one parquet row group per
+    chunk. Each row group is flushed to the client as soon as it is written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    conn = get_read_engine().raw_connection()
+    try:
+        # a named cursor is server-side in psycopg
+        with conn.driver_connection.cursor(name=f"export_{table}") as cur:
+            cur.execute(_select_sql(table), params)
+            schema = _arrow_schema(pa, cur.description)
+            writer = pq.ParquetWriter(sink, schema)
+            while True:
+                rows = cur.fetchmany(CHUNK_ROWS)
+                if not rows:
+                    break
+                cols = zip(*rows)
+                writer.write_table(pa.Table.from_pydict({f.name: list(c) for f, c in zip(schema, cols)}, schema=schema))
+                yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    finally:
+        conn.close()
+
+def accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, param = part.partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            _, _, q = param.partition("q=")
+            try:
+                return float(q) > 0 if q.strip() else True
+            except ValueError:
+                return True
+    return False
+
+@router.get("/{table}")
+def export_table(request: Request, table: str, start: str, end: str, format: str = "csv"):
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"table must be one of {', '.join(TABLES)}")
+    try:
+        d_start, d_end = date.fromisoformat(start), date.fromisoformat(end)
+    except Exception:
+        raise HTTPException(status_code=400, detail="start/end must be YYYY-MM-DD")
+    if d_end < d_start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    params = _bounds(table, d_start, d_end)
+    filename = f"{table}_{d_start}_{d_end}"
+
+    if format == "csv":
+        # only gzip for clients that asked for it; others get plain CSV
+        compress = accepts_gzip(request)
+        headers = {"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return StreamingResponse(stream_csv(table, params, compress), media_type="text/csv", headers=headers)
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="parquet export requires pyarrow")
+        # parquet pages are already compressed; gzip on top would only cost CPU
+        return StreamingResponse(
+            stream_parquet(table, params),
+            media_type="application/vnd.apache.parquet",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.parquet"'},
+        )
+    raise HTTPException(status_code=400, detail="format must be csv or parquet")
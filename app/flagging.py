@@ -0,0 +1,159 @@
+"""
+Batch anomaly flagging for activities.
+
+Rules are evaluated over columnar NumPy arrays for a whole day/season (or a
+list of freshly ingested ids) in one pass; only rows whose verdict changed
+are written back. Flagged rides are skipped by `rollup.compute_day`.
+"""
+import time
+from datetime import date, datetime
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import BigInteger, any_, bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .db import session_scope
+from .models import Activity
+from .rollup import mark_dirty
+from .utils_time import challenge_day, day_window
+
+class FlagResult(NamedTuple):
+    changed: int
+    # challenge days whose rollups/points are stale because a verdict changed
+    days: list[date]
+
+# (athlete_id, indoor) -> (median avg speed km/h or None, computed_at monotonic)
+_baselines: dict[tuple[int, bool], tuple[float | None, float]] = {}
+
+# indoor = the same is_virtual OR trainer split compute_day uses
+BASELINE_SQL = text("""
+    SELECT athlete_id,
+           (is_virtual OR trainer) AS indoor,
+           COUNT(*) AS n,
+           percentile_cont(0.5) WITHIN GROUP (
+             ORDER BY distance_m / moving_time_s * 3.6
+           ) AS median_kmh
+    FROM activities
+    WHERE athlete_id = ANY(:aids)
+      AND flagged = FALSE AND is_ebike = FALSE AND moving_time_s > 0
+    GROUP BY athlete_id, (is_virtual OR trainer)
+""")
+
+def athlete_baselines(db: Session, athlete_ids: np.ndarray) -> dict[tuple[int, bool], float | None]:
+    """
+    Median average speed per athlete and indoor/outdoor over their unflagged
+    rides, cached for FLAG_BASELINE_TTL_S. Indoor and outdoor speeds differ too
+    much to share a median. Fewer than FLAG_BASELINE_MIN_RIDES rides in a group
+    means no baseline (None).
+    """
+    s = get_settings()
+    now = time.monotonic()
+    wanted = [(int(a), indoor) for a in athlete_ids for indoor in (False, True)]
+    stale = [k for k in wanted if k not in _baselines or now - _baselines[k][1] > s.FLAG_BASELINE_TTL_S]
+    if stale:
+        aids = sorted({a for a, _ in stale})
+        found = {(r.athlete_id, bool(r.indoor)): r for r in db.execute(BASELINE_SQL, {"aids": aids})}
+        for k in stale:
+            r = found.get(k)
+            value = float(r.median_kmh) if r and r.n >= s.FLAG_BASELINE_MIN_RIDES else None
+            _baselines[k] = (value, now)
+    return {k: _baselines[k][0] for k in wanted}
+
+def evaluate(
+    db: Session,
+    athlete_id: np.ndarray,
+    distance_m: np.ndarray,
+    moving_time_s: np.ndarray,
+    is_ebike: np.ndarray,
+    indoor: np.ndarray,
+) -> np.ndarray:
+    """
+    Boolean mask of rides that break a rule:
+      - average speed above FLAG_MAX_AVG_SPEED_KMH (car trips logged as rides)
+      - distance above FLAG_MAX_DISTANCE_KM, or distance with no moving time (GPS glitches)
+      - average speed above FLAG_BASELINE_FACTOR x the athlete's indoor or outdoor median
+    E-bike rides never score, so they are never flagged.
+    """
+    s = get_settings()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed_kmh = np.where(moving_time_s > 0, distance_m / moving_time_s * 3.6, np.inf)
+    speed_kmh[distance_m <= 0] = 0.0
+
+    aids, inverse = np.unique(athlete_id, return_inverse=True)
+    base = athlete_baselines(db, aids)
+    out_base = np.array([np.nan if base[(int(a), False)] is None else base[(int(a), False)] for a in aids], dtype=float)
+    in_base = np.array([np.nan if base[(int(a), True)] is None else base[(int(a), True)] for a in aids], dtype=float)
+    baseline = np.where(indoor, in_base[inverse], out_base[inverse])
+
+    flagged = (speed_kmh > s.FLAG_MAX_AVG_SPEED_KMH) | (distance_m / 1000.0 > s.FLAG_MAX_DISTANCE_KM)
+    with np.errstate(invalid="ignore"):
+        flagged |= speed_kmh > s.FLAG_BASELINE_FACTOR * baseline  # NaN baseline compares False
+    return flagged & ~is_ebike
+
+def _flag_where(db: Session, *criteria) -> FlagResult:
+    rows = db.execute(
+        select(
+            Activity.id, Activity.athlete_id, Activity.distance_m,
+            Activity.moving_time_s, Activity.is_ebike, Activity.flagged,
+            Activity.start_date_local, Activity.is_virtual, Activity.trainer,
+        ).where(*criteria)
+    ).all()
+    if not rows:
+        return FlagResult(0, [])
+
+    ids, aids, dist, moving, ebike, current, starts, virtual, trainer = (np.asarray(c) for c in zip(*rows))
+    verdict = evaluate(
+        db,
+        aids.astype(np.int64),
+        dist.astype(float),
+        moving.astype(float),
+        ebike.astype(bool),
+        virtual.astype(bool) | trainer.astype(bool),
+    )
+    changed = verdict != current.astype(bool)
+    if changed.any():
+        upd = text("UPDATE activities SET flagged = :f WHERE id = ANY(:ids)")
+        on, off = ids[changed & verdict], ids[changed & ~verdict]
+        if on.size:
+            db.execute(upd, {"f": True, "ids": on.tolist()})
+        if off.size:
+            db.execute(upd, {"f": False, "ids": off.tolist()})
+        db.commit()
+        # new flags change who counts towards baselines
+        for a in np.unique(aids[changed]).tolist():
+            _baselines.pop((a, False), None)
+            _baselines.pop((a, True), None)
+    days = sorted({challenge_day(s) for s in starts[changed]})
+    return FlagResult(int(changed.sum()), days)
+
+def flag_activities(db: Session, ids: list[int]) -> FlagResult:
+    """
+    Incremental pass over freshly ingested activities.
+    """
+    if not ids:
+        return FlagResult(0, [])
+    # one array parameter instead of an IN list, so bulk imports stay under the bind limit
+    return _flag_where(db, Activity.id == any_(bindparam("ids", list(ids), type_=ARRAY(BigInteger))))
+
+def flag_range(db: Session, start: datetime, end: datetime) -> FlagResult:
+    return _flag_where(db, Activity.start_date_local >= start, Activity.start_date_local <= end)
+
+def flag_days(db: Session, first: date, last: date) -> FlagResult:
+    """
+    Re-evaluate every activity between two challenge days (inclusive).
+    """
+    start, _ = day_window(first)
+    _, end = day_window(last)
+    return flag_range(db, start, end)
+
+def flag_activities_background(ids: list[int]):
+    """
+    BackgroundTasks entry point: runs after the response with its own session.
+    Days whose verdicts changed are only marked dirty; rollup.recompute_dirty
+    (admin call or scheduled job) recomputes them, never the API worker.
+    """
+    with session_scope() as db:
+        mark_dirty(db, flag_activities(db, ids).days)
@@ -4,7 +4,10 @@ from .models import Participant, Activity
 from .strava import get_activity
 from .classify import is_cycling, is_ebike
 
-async def handle_strava_event(payload: dict):
+async def handle_strava_event(payload: dict) -> int | None:
+    """
+    Upsert the activity behind a webhook event; returns its id, or None if skipped.
+    """
     if payload.get("object_type") != "activity":
         return
     activity_id = int(payload["object_id"])
@@ -39,3 +42,4 @@ async def handle_strava_event(payload: dict):
 
         db.add(a)
         db.commit()
+        return a.id
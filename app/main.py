@@ -1,14 +1,21 @@
+import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from datetime import date as ddate
 from fastapi.responses import RedirectResponse
-from .config import settings
-from .db import engine, get_session
-from . import models
+from . import IMPORTED_AT
+from .config import get_settings
+from .db import get_engine, get_read_engine, get_session, get_read_session, prewarm_pool
+from .directory import directory, display_name
 from .webhook import router as webhook_router
-from .rollup import compute_day
+from .export import router as export_router
+from .rollup import compute_day, mark_dirty, recompute_dirty, rollup_lock
+from .flagging import flag_activities, flag_days
 from .strava import exchange_code
 from .models import Participant, Activity, Points, DailyRollup
 from sqlalchemy import text
@@ -16,11 +23,30 @@ from .security import require_admin
 from httpx import HTTPStatusError
 from .strava import refresh_token, list_activities, get_self_profile
 from .classify import is_cycling, is_ebike
+from .utils_time import challenge_day
 
-models.Base.metadata.create_all(bind=engine)
+# uvicorn only attaches handlers to its own loggers
+log = logging.getLogger("uvicorn.error")
 
-app = FastAPI(title="BEAT Every Day API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema is managed by `alembic upgrade head`, never at import/startup
+    t0 = time.perf_counter()
+    settings = get_settings()
+    if settings.DB_POOL_PREWARM > 0:
+        await run_in_threadpool(prewarm_pool, settings.DB_POOL_PREWARM)
+    done = time.perf_counter()
+    log.info(
+        "startup complete in %.0f ms (import %.0f ms, lifespan %.0f ms)",
+        (done - IMPORTED_AT) * 1000, (t0 - IMPORTED_AT) * 1000, (done - t0) * 1000,
+    )
+    yield
+    get_engine().dispose()
+    get_read_engine().dispose()
+
+app = FastAPI(title="BEAT Every Day API", lifespan=lifespan)
 app.include_router(webhook_router)
+app.include_router(export_router)
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
@@ -29,7 +55,7 @@ async def health():
     return {"status": "ok"}
 
 @app.get("/leaderboard")
-def leaderboard(date: str, db: Session = Depends(get_session)):
+def leaderboard(date: str, db: Session = Depends(get_read_session)):
     # parse YYYY-MM-DD strictly
     try:
         target = ddate.fromisoformat(date)
@@ -145,12 +171,44 @@ async def admin_recompute(
     db: Session = Depends(get_session),
 ):
     from datetime import date as ddate  # ensure alias in this scope
-    compute_day(db, ddate.fromisoformat(d))
+    with rollup_lock():
+        compute_day(db, ddate.fromisoformat(d))
     return {"ok": True}
 
+@app.post("/admin/recompute/dirty")
+def admin_recompute_dirty(_: None = Depends(require_admin), db: Session = Depends(get_session)):
+    """
+    Recompute every day marked dirty by flagging/ingest; meant for a scheduled job.
+    """
+    return {"ok": True, "recomputed": [str(d) for d in recompute_dirty(db)]}
+
+@app.post("/admin/flag")
+def admin_flag(
+    start: str,
+    end: str | None = None,
+    _: None = Depends(require_admin),
+    db: Session = Depends(get_session),
+):
+    """
+    Re-run anomaly flagging for a day or a range of days (e.g. after tuning FLAG_* rules),
+    then recompute rollups/points from the first day whose flags changed.
+    """
+    first = ddate.fromisoformat(start)
+    last = ddate.fromisoformat(end) if end else first
+    result = flag_days(db, first, last)
+    mark_dirty(db, result.days)
+    recomputed = recompute_dirty(db)
+    return {
+        "ok": True,
+        "changed": result.changed,
+        "days": [str(d) for d in result.days],
+        "recomputed": [str(d) for d in recomputed],
+    }
+
 @app.post("/admin/participants/refresh_names")
 async def refresh_names(_=Depends(require_admin), db: Session = Depends(get_session)):
     updated = 0
+    renamed = []
     for p in db.query(Participant).filter(Participant.strava_access_token.isnot(None)).all():
         try:
             prof = await get_self_profile(p.strava_access_token)
@@ -171,12 +229,16 @@ async def refresh_names(_=Depends(require_admin), db: Session = Depends(get_sess
         if new_name and new_name != (p.name or ""):
             p.name = new_name
             db.add(p); updated += 1
+            renamed.append((p.id, display_name(new_name, p.strava_athlete_id)))
 
     db.commit()
+    for pid, nm in renamed:
+        directory.put(pid, nm)
     return {"ok": True, "updated": updated}
 
 @app.get("/auth/strava/start")
 async def auth_start():
+    settings = get_settings()
     scopes = "read,activity:read,activity:read_all"
     url = (
         "https://www.strava.com/oauth/authorize?"
@@ -202,16 +264,13 @@ async def auth_cb(code: str, state: str | None = None, db: Session = Depends(get
 
     db.add(p)
     db.commit()
+    directory.put(p.id, display_name(p.name, p.strava_athlete_id))
     return {"ok": True, "message": "Strava connected"}
 
 @app.get("/participants")
-def participants(db: Session = Depends(get_session)):
-    out = []
-    for p in db.query(Participant).all():
-        # prefer p.name; fall back safely
-        nm = getattr(p, "name", None) or f"Strava #{getattr(p,'strava_athlete_id', '???')}"
-        out.append({"id": p.id, "name": nm})
-    return out
+def participants():
+    # served from the in-process directory; no ORM rows, no token columns
+    return [{"id": pid, "name": nm} for pid, nm in directory.names().items()]
 
 @app.post("/admin/backfill")
 async def admin_backfill(
@@ -225,6 +284,8 @@ async def admin_backfill(
     before_ts = int(before.timestamp())
 
     participants = db.query(Participant).filter(Participant.strava_access_token.isnot(None)).all()
+    touched = []
+    touched_days = set()
     for p in participants:
         token = p.strava_access_token
         try:
@@ -240,6 +301,7 @@ async def admin_backfill(
             else:
                 continue
 
+        pending = []
         for a in acts:
             sport = a.get("sport_type") or a.get("type")
             if not is_cycling(sport) and not is_ebike(sport):
@@ -258,10 +320,19 @@ async def admin_backfill(
             rec.is_virtual = (sport == "VirtualRide")
             rec.is_ebike = (sport == "EBikeRide")
             db.add(rec)
+            pending.append(rec)
 
+        # collect plain ids/days before commit expires the objects
+        db.flush()
+        touched.extend(rec.id for rec in pending)
+        touched_days.update(challenge_day(rec.start_date_local) for rec in pending)
         db.commit()
 
-    return {"ok": True, "days": days}
+    # new or updated rides and changed flags both make rolled-up days stale
+    flagged = flag_activities(db, touched)
+    mark_dirty(db, touched_days | set(flagged.days))
+    recomputed = recompute_dirty(db)
+    return {"ok": True, "days": days, "flagged": flagged.changed, "recomputed": [str(d) for d in recomputed]}
 
 @app.post("/admin/participants/{pid}/rename")
 def rename_participant(
@@ -273,6 +344,7 @@ def rename_participant(
     p = db.query(Participant).get(pid)
     if not p:
         raise HTTPException(404, "participant not found")
-    p.display_name = name
+    p.name = name
     db.add(p); db.commit()
-    return {"ok": True, "id": p.id, "name": p.display_name}
+    directory.put(p.id, display_name(p.name, p.strava_athlete_id))
+    return {"ok": True, "id": p.id, "name": p.name}
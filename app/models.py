@@ -3,7 +3,7 @@ from datetime import datetime, date
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy import (
     String, Integer, BigInteger, Boolean, Date, DateTime,
-    ForeignKey, Float, UniqueConstraint, Index
+    ForeignKey, Float, UniqueConstraint, Index, func
 )
 
 class Base(DeclarativeBase):
@@ -80,3 +80,9 @@ class Points(Base):
     athlete_id: Mapped[int] = mapped_column(ForeignKey("participants.id"))
     daily_points: Mapped[int] = mapped_column(Integer, default=0)
     cumulative_points: Mapped[int] = mapped_column(Integer, default=0)
+
+class RollupDirty(Base):
+    # challenge days whose rollups/points must be recomputed (see rollup.recompute_dirty)
+    __tablename__ = "rollup_dirty"
+    date: Mapped[date] = mapped_column(Date, primary_key=True)
+    marked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,13 +1,21 @@
-from datetime import date
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Iterable, Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_
-from .models import Activity, DailyRollup, Points, Award
-from .utils_time import day_window, is_early_bird, is_night_owl, TZ
+from sqlalchemy import func, case, and_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .db import get_engine
+from .models import Activity, DailyRollup, Points, Award, RollupDirty
+from .utils_time import day_window, is_early_bird, is_night_owl, get_tz
 
 KM = 1000.0
 
+# advisory lock id shared by every process that rewrites rollups/points/awards
+ROLLUP_LOCK_KEY = 0x62656174  # "beat"
+
 def compute_day(db: Session, d: date):
     start, end = day_window(d)
+    tz = get_tz()
 
     indoor_expr = ( (Activity.is_virtual == True) | (Activity.trainer == True) )
     dist_indoor = func.sum(case((indoor_expr, Activity.distance_m), else_=0.0))
@@ -23,9 +31,18 @@ def compute_day(db: Session, d: date):
         Activity.start_date_local >= start,
         Activity.start_date_local <= end,
         Activity.is_ebike == False,
+        Activity.flagged == False,
     ).group_by(Activity.athlete_id).all()
 
-    # Upsert rollups
+    # Upsert rollups; athletes whose rides are all gone (e.g. flagged) drop to zero
+    seen = {r.athlete_id for r in rows}
+    for roll in db.query(DailyRollup).filter_by(date=d).all():
+        if roll.athlete_id not in seen:
+            roll.km_total = roll.km_indoor = roll.km_outdoor = 0.0
+            roll.met_25km = roll.early_bird = roll.night_owl = False
+            roll.first_start_time_local = None
+            db.add(roll)
+
     for r in rows:
         roll = db.query(DailyRollup).filter_by(athlete_id=r.athlete_id, date=d).first()
         if not roll:
@@ -35,12 +52,15 @@ def compute_day(db: Session, d: date):
         roll.km_outdoor = (r.dist_outdoor or 0) / KM
         roll.met_25km = roll.km_total >= 25
         roll.first_start_time_local = r.first_start
-        roll.early_bird = bool(r.first_start and is_early_bird(r.first_start.astimezone(TZ)))
-        roll.night_owl = bool(r.first_start and is_night_owl(r.first_start.astimezone(TZ)))
+        roll.early_bird = bool(r.first_start and is_early_bird(r.first_start.astimezone(tz)))
+        roll.night_owl = bool(r.first_start and is_night_owl(r.first_start.astimezone(tz)))
         db.add(roll)
     db.commit()
 
-    # Awards (example: longest indoor/outdoor)
+    # Awards (example: longest indoor/outdoor); replaced so recomputes don't duplicate
+    db.query(Award).filter(Award.date == d, Award.category.in_(("road_warrior", "zwift_warrior"))).delete(
+        synchronize_session=False
+    )
     top_out = db.query(DailyRollup).filter_by(date=d).order_by(DailyRollup.km_outdoor.desc()).first()
     top_in = db.query(DailyRollup).filter_by(date=d).order_by(DailyRollup.km_indoor.desc()).first()
     if top_out:
@@ -78,3 +98,62 @@ def compute_day(db: Session, d: date):
 
     db.commit()
 
+@contextmanager
+def rollup_lock() -> Iterator[None]:
+    """
+    Serialize rollup writers across workers and the CLI. compute_day upserts
+    without unique-safe SQL and replaces awards in two steps, so concurrent
+    runs collide on uq_rollup_day or duplicate rows. The session-level
+    advisory lock lives on its own connection because compute_day commits
+    several times, and the Session may change connections between commits.
+    """
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": ROLLUP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ROLLUP_LOCK_KEY})
+
+def _recompute_from(db: Session, first: date) -> list[date]:
+    """
+    Re-run compute_day from `first` through the latest rolled-up day, in order,
+    so cumulative points carry forward. Days not rolled up yet are left alone.
+    Caller holds rollup_lock().
+    """
+    last = db.query(func.max(DailyRollup.date)).scalar()
+    days = []
+    d = first
+    while last is not None and d <= last:
+        compute_day(db, d)
+        days.append(d)
+        d += timedelta(days=1)
+    return days
+
+def mark_dirty(db: Session, days: Iterable[date]):
+    """
+    Record days whose rollups are stale. Cheap enough for ingest paths; the
+    recompute itself happens in recompute_dirty (admin call or scheduled job).
+    """
+    rows = [{"date": d} for d in set(days)]
+    if not rows:
+        return
+    stmt = pg_insert(RollupDirty).values(rows)
+    # re-marking bumps marked_at so a recompute already in flight won't clear it
+    db.execute(stmt.on_conflict_do_update(index_elements=["date"], set_={"marked_at": func.now()}))
+    db.commit()
+
+def recompute_dirty(db: Session) -> list[date]:
+    """
+    Recompute from the earliest dirty day through the latest rolled-up day.
+    Marks are cleared only after the recompute succeeds, and only if they were
+    not re-marked meanwhile.
+    """
+    with rollup_lock():
+        dirty = {d: at for d, at in db.query(RollupDirty.date, RollupDirty.marked_at).all()}
+        if not dirty:
+            return []
+        days = _recompute_from(db, min(dirty))
+        for d, at in dirty.items():
+            db.query(RollupDirty).filter_by(date=d, marked_at=at).delete(synchronize_session=False)
+        db.commit()
+        return days
@@ -1,9 +1,10 @@
 import httpx
-from .config import settings
+from .config import get_settings
 
 BASE = "https://www.strava.com/api/v3"
 
 async def exchange_code(code: str):
+    settings = get_settings()
     async with httpx.AsyncClient(timeout=30) as c:
         r = await c.post("https://www.strava.com/oauth/token", data={
             "client_id": settings.STRAVA_CLIENT_ID,
@@ -15,6 +16,7 @@ async def exchange_code(code: str):
         return r.json()
 
 async def refresh_token(refresh_token: str):
+    settings = get_settings()
     async with httpx.AsyncClient(timeout=30) as c:
         r = await c.post("https://www.strava.com/oauth/token", data={
             "client_id": settings.STRAVA_CLIENT_ID,
@@ -1,21 +1,29 @@
 from datetime import datetime, date, time, timedelta
+from functools import lru_cache
 import zoneinfo
-from .config import settings
+from .config import get_settings
 
-TZ = zoneinfo.ZoneInfo(settings.CHALLENGE_TZ)
+@lru_cache
+def get_tz() -> zoneinfo.ZoneInfo:
+    return zoneinfo.ZoneInfo(get_settings().CHALLENGE_TZ)
 
 def day_window(d: date):
-    start = datetime.combine(d, time(0,0)).replace(tzinfo=TZ)
-    end = datetime.combine(d, time(23,59,59)).replace(tzinfo=TZ)
+    tz = get_tz()
+    start = datetime.combine(d, time(0,0)).replace(tzinfo=tz)
+    end = datetime.combine(d, time(23,59,59)).replace(tzinfo=tz)
     return start, end
 
+def challenge_day(dt: datetime) -> date:
+    # the day whose day_window contains dt
+    return dt.astimezone(get_tz()).date()
+
 def grace_deadline_for(d: date):
     # Next day at GRACE_CUTOFF_HOUR local
-    deadline = datetime.combine(d + timedelta(days=1), time(settings.GRACE_CUTOFF_HOUR,0)).replace(tzinfo=TZ)
+    deadline = datetime.combine(d + timedelta(days=1), time(get_settings().GRACE_CUTOFF_HOUR,0)).replace(tzinfo=get_tz())
     return deadline
 
 def is_early_bird(dt_local: datetime):
-    return dt_local.astimezone(TZ).time() < time(7,0)
+    return dt_local.astimezone(get_tz()).time() < time(7,0)
 
 def is_night_owl(dt_local: datetime):
-    return dt_local.astimezone(TZ).time() >= time(22,0)
+    return dt_local.astimezone(get_tz()).time() >= time(22,0)
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
-from .config import settings
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from .config import get_settings
 from .ingest import handle_strava_event
+from .flagging import flag_activities_background
 
 router = APIRouter(prefix="/webhook")
 
@@ -10,13 +11,16 @@ async def verify_strava(
     challenge: str | None = Query(None, alias="hub.challenge"),
     verify_token: str | None = Query(None, alias="hub.verify_token"),
 ):
-    if verify_token != settings.STRAVA_VERIFY_TOKEN:
+    if verify_token != get_settings().STRAVA_VERIFY_TOKEN:
         raise HTTPException(status_code=403, detail="Bad token")
     # Strava expects this exact key back
     return {"hub.challenge": challenge}
 
 @router.post("/strava")
-async def receive_event(payload: dict):
+async def receive_event(payload: dict, background: BackgroundTasks):
     # Strava sends {object_type, object_id, aspect_type, updates, owner_id}
-    await handle_strava_event(payload)
+    activity_id = await handle_strava_event(payload)
+    if activity_id is not None:
+        # flag after responding so ingest latency is unchanged
+        background.add_task(flag_activities_background, [activity_id])
     return {"ok": True}